@@ -6,6 +6,7 @@ import sys
 WIDTH, HEIGHT = 800, 800
 ROWS, COLS = 10, 10
 SQUARE_SIZE = WIDTH // COLS
+DEBUG = False  # verify the board's occupancy indexes against the pieces dict after every move
 
 # Colors
 LIGHT = (240, 217, 181)
@@ -34,10 +35,370 @@ class Piece:
     def __repr__(self):
         return f"{self.color}{self.kind}"
 
+# --- Piece Definitions ---
+# Every piece kind is described as data below and compiled once at startup into a
+# move generator function. Board.valid_moves just dispatches on piece.kind.
+ORTHOGONAL = ((-1,0),(1,0),(0,-1),(0,1))
+DIAGONAL = ((-1,-1),(-1,1),(1,-1),(1,1))
+ALL_DIRECTIONS = ORTHOGONAL + DIAGONAL
+BACK_ROWS = (0, ROWS - 1)
+
+class PieceDef:
+    def __init__(self, kind, name, leaps=(), jumps=True, rays=(), ray_range=None,
+                 can_capture=True, teleport=False, mimic=False, mimic_fallback=None,
+                 pawn=False, castles=False, promotion_rows=(), promotes_to=None):
+        self.kind = kind
+        self.name = name
+        self.leaps = leaps                    # (dr, dc) offsets reached in a single step
+        self.jumps = jumps                    # False: straight leaps are blocked by pieces in between
+        self.rays = rays                      # (dr, dc) sliding directions
+        self.ray_range = ray_range            # max squares per ray, None = unlimited
+        self.can_capture = can_capture
+        self.teleport = teleport              # any empty square of the same square colour (Bureaucrat)
+        self.mimic = mimic                    # moves like the last moved piece kind (Jester)
+        self.mimic_fallback = mimic_fallback  # kind used when the last moved kind is itself a mimic
+        self.pawn = pawn                      # pushes, double step, diagonal captures, en passant
+        self.castles = castles
+        self.promotion_rows = promotion_rows
+        self.promotes_to = promotes_to        # None with promotion_rows set = player chooses
+
+PIECE_DEFS = {d.kind: d for d in [
+    PieceDef('K', 'King', leaps=ALL_DIRECTIONS, castles=True),
+    PieceDef('Q', 'Queen', rays=ALL_DIRECTIONS),
+    PieceDef('R', 'Rook', rays=ORTHOGONAL),
+    PieceDef('B', 'Bishop', rays=DIAGONAL),
+    PieceDef('N', 'Knight', leaps=((-2,-1),(-2,1),(2,-1),(2,1),(-1,-2),(-1,2),(1,-2),(1,2))),
+    PieceDef('P', 'Pawn', pawn=True, promotion_rows=BACK_ROWS),
+    # Bureaucrat (C): can move to ANY empty square of same color parity; cannot capture
+    PieceDef('C', 'Bureaucrat', teleport=True, can_capture=False),
+    # Jester (J): moves like the last moved piece kind; king-like if nothing has moved yet
+    PieceDef('J', 'Jester', leaps=ALL_DIRECTIONS, mimic=True, mimic_fallback='K'),
+    # Squire (S): 2 squares orthogonally, jumping; becomes a Knight on a back row
+    PieceDef('S', 'Squire', leaps=((-2,0),(2,0),(0,-2),(0,2)), promotion_rows=BACK_ROWS, promotes_to='N'),
+    # Paladin (L): 2 squares diagonally, jumping; becomes a Bishop on a back row
+    PieceDef('L', 'Paladin', leaps=((-2,-2),(-2,2),(2,-2),(2,2)), promotion_rows=BACK_ROWS, promotes_to='B'),
+    # Prince (V): up to 2 squares in any direction, path must be clear
+    PieceDef('V', 'Prince', rays=ALL_DIRECTIONS, ray_range=2),
+    # Princess (W): up to 3 squares in any direction, path must be clear
+    PieceDef('W', 'Princess', rays=ALL_DIRECTIONS, ray_range=3),
+]}
+
+# Starting layout, left to right columns 0..9 (black on rows 0/1, white mirrored on rows 9/8)
+# Jester at col3, Bureaucrat at col6; Squire in front of knights, Paladin in front of bishops,
+# Prince in front of king, Princess in front of queen
+BACK_RANK = ['R','N','B','J','K','Q','C','B','N','R']
+FRONT_RANK = ['P','S','L','P','V','W','P','L','S','P']
+
+ALL_SQUARES = [(r, c) for r in range(ROWS) for c in range(COLS)]
+
+def _inside(r, c):
+    return 0 <= r < ROWS and 0 <= c < COLS
+
+def _leap_table(offsets, jumps):
+    # square -> tuple of (target, squares that must be empty on the way)
+    table = {}
+    for r, c in ALL_SQUARES:
+        entries = []
+        for dr, dc in offsets:
+            if not _inside(r + dr, c + dc):
+                continue
+            path = ()
+            if not jumps and (dr == 0 or dc == 0 or abs(dr) == abs(dc)):
+                steps = max(abs(dr), abs(dc))
+                ur, uc = dr // steps, dc // steps
+                path = tuple((r + ur*i, c + uc*i) for i in range(1, steps))
+            entries.append(((r + dr, c + dc), path))
+        table[(r, c)] = tuple(entries)
+    return table
+
+def _ray_table(directions, max_range):
+    # square -> tuple of rays, each ray the in-board squares outward from the square
+    table = {}
+    for r, c in ALL_SQUARES:
+        rays = []
+        for dr, dc in directions:
+            ray = []
+            step = 1
+            while max_range is None or step <= max_range:
+                nr, nc = r + dr*step, c + dc*step
+                if not _inside(nr, nc):
+                    break
+                ray.append((nr, nc))
+                step += 1
+            if ray:
+                rays.append(tuple(ray))
+        table[(r, c)] = tuple(rays)
+    return table
+
+def _compile_leaper(defn):
+    table = _leap_table(defn.leaps, defn.jumps)
+    can_capture = defn.can_capture
+    if defn.jumps:
+        targets = {sq: tuple(t for t, _ in entries) for sq, entries in table.items()}
+        def gen(board, color, start):
+            pieces = board.pieces
+            moves = []
+            for sq in targets[start]:
+                p = pieces.get(sq)
+                if p is None or (can_capture and p.color != color):
+                    moves.append(sq)
+            return moves
+    else:
+        def gen(board, color, start):
+            pieces = board.pieces
+            moves = []
+            for sq, path in table[start]:
+                if any(mid in pieces for mid in path):
+                    continue
+                p = pieces.get(sq)
+                if p is None or (can_capture and p.color != color):
+                    moves.append(sq)
+            return moves
+    return gen
+
+def _compile_slider(defn):
+    table = _ray_table(defn.rays, defn.ray_range)
+    can_capture = defn.can_capture
+    def gen(board, color, start):
+        pieces = board.pieces
+        moves = []
+        for ray in table[start]:
+            for sq in ray:
+                p = pieces.get(sq)
+                if p is None:
+                    moves.append(sq)
+                else:
+                    if can_capture and p.color != color:
+                        moves.append(sq)
+                    break
+        return moves
+    return gen
+
+def _compile_teleport(defn):
+    by_parity = {0: [], 1: []}
+    for r, c in ALL_SQUARES:
+        by_parity[(r + c) % 2].append((r, c))
+    can_capture = defn.can_capture
+    def gen(board, color, start):
+        parity = (start[0] + start[1]) % 2
+        if can_capture:
+            pieces = board.pieces
+            return [sq for sq in by_parity[parity] if sq not in pieces or pieces[sq].color != color]
+        # the board keeps its empty squares split by square colour
+        return list(board.empty_by_parity[parity])
+    return gen
+
+def _pawn_moves(board, color, start):
+    # forward 1 (or 2 from start), captures diag, en passant tracked via last_pawn_double_move
+    r, c = start
+    pieces = board.pieces
+    moves = []
+    direction = -1 if color == 'w' else 1
+    start_row = ROWS - 2 if color == 'w' else 1
+    nr = r + direction
+    # forward 1
+    if _inside(nr, c) and (nr, c) not in pieces:
+        moves.append((nr, c))
+        # forward 2 from start
+        two_r = r + 2*direction
+        if r == start_row and _inside(two_r, c) and (two_r, c) not in pieces:
+            moves.append((two_r, c))
+    # captures (and en passant)
+    for dc in (-1, 1):
+        nc = c + dc
+        if _inside(nr, nc):
+            if (nr, nc) in pieces and pieces[(nr, nc)].color != color:
+                moves.append((nr, nc))
+            # en passant: if pawn that moved two squares is adjacent on same row
+            if board.last_pawn_double_move:
+                lr, lc = board.last_pawn_double_move
+                if lr == r and lc == nc:
+                    moves.append((nr, nc))
+    return moves
+
+def _castling_moves(board, color, start):
+    # castling (special 10x10 positions); only if original king still exists and hasn't moved
+    row = ROWS - 1 if color == 'w' else 0
+    pieces = board.pieces
+    has_moved = board.has_moved
+    moves = []
+    if not has_moved[color + 'K'] and not has_moved[color + 'R_left'] and all((row, i) not in pieces for i in range(1, 4)):
+        moves.append((row, 1))
+    if not has_moved[color + 'K'] and not has_moved[color + 'R_right'] and all((row, i) not in pieces for i in range(5, COLS - 1)):
+        moves.append((row, 7))
+    return moves
+
+def _compile_mimic(defn, own):
+    fallback = defn.mimic_fallback
+    def gen(board, color, start):
+        last_kind = board.last_moved_kind
+        if not last_kind:
+            return own(board, color, start)
+        # avoid cycles: mimicking another mimic uses the fallback kind instead
+        if PIECE_DEFS[last_kind].mimic:
+            last_kind = fallback
+        pieces = board.pieces
+        return [mv for mv in MOVE_GENERATORS[last_kind](board, color, start)
+                if mv not in pieces or pieces[mv].color != color]
+    return gen
+
+def compile_piece(defn):
+    """Build a move generator gen(board, color, start) -> list of destinations."""
+    parts = []
+    if defn.pawn:
+        parts.append(_pawn_moves)
+    if defn.leaps:
+        parts.append(_compile_leaper(defn))
+    if defn.rays:
+        parts.append(_compile_slider(defn))
+    if defn.teleport:
+        parts.append(_compile_teleport(defn))
+    if defn.castles:
+        parts.append(_castling_moves)
+
+    if len(parts) == 1:
+        gen = parts[0]
+    else:
+        def gen(board, color, start):
+            moves = []
+            for part in parts:
+                moves.extend(part(board, color, start))
+            return moves
+    if defn.mimic:
+        gen = _compile_mimic(defn, gen)
+    return gen
+
+MOVE_GENERATORS = {kind: compile_piece(defn) for kind, defn in PIECE_DEFS.items()}
+
+# --- Attack Tables ---
+# Attack generators return every square a piece strikes, squares holding its own pieces
+# included, so the same sets answer "is this square defended". Pawn pushes, castling and
+# non-capturing pieces never strike anything. Mimics are resolved first with attack_kind().
+PAWN_ATTACKS = {color: {(r, c): tuple((r + dr, c + dc) for dc in (-1, 1) if _inside(r + dr, c + dc))
+                        for r, c in ALL_SQUARES}
+                for color, dr in (('w', -1), ('b', 1))}
+
+# square -> tuple of (direction, full ray from the square in that direction)
+LINES = {sq: [] for sq in ALL_SQUARES}
+for _u in ALL_DIRECTIONS:
+    for _sq, _rays in _ray_table((_u,), None).items():
+        if _rays:
+            LINES[_sq].append((_u, _rays[0]))
+
+def _compile_leaper_attacks(defn):
+    table = _leap_table(defn.leaps, defn.jumps)
+    if defn.jumps:
+        targets = {sq: [t for t, _ in entries] for sq, entries in table.items()}
+        return lambda pieces, color, start: targets[start]
+    def attacks(pieces, color, start):
+        return [sq for sq, path in table[start] if not any(mid in pieces for mid in path)]
+    return attacks
+
+def _compile_slider_attacks(defn):
+    table = _ray_table(defn.rays, defn.ray_range)
+    def attacks(pieces, color, start):
+        hits = []
+        for ray in table[start]:
+            for sq in ray:
+                hits.append(sq)
+                if sq in pieces:
+                    break
+        return hits
+    return attacks
+
+def _compile_teleport_attacks(defn):
+    by_parity = {0: [], 1: []}
+    for r, c in ALL_SQUARES:
+        by_parity[(r + c) % 2].append((r, c))
+    return lambda pieces, color, start: [sq for sq in by_parity[(start[0] + start[1]) % 2] if sq != start]
+
+def compile_attacks(defn):
+    """Build an attack generator attacks(pieces, color, start) -> list of struck squares."""
+    parts = []
+    if defn.can_capture:
+        if defn.pawn:
+            parts.append(lambda pieces, color, start: PAWN_ATTACKS[color][start])
+        if defn.leaps:
+            parts.append(_compile_leaper_attacks(defn))
+        if defn.rays:
+            parts.append(_compile_slider_attacks(defn))
+        if defn.teleport:
+            parts.append(_compile_teleport_attacks(defn))
+    if len(parts) == 1:
+        return parts[0]
+    def attacks(pieces, color, start):
+        hits = []
+        for part in parts:
+            hits.extend(part(pieces, color, start))
+        return hits
+    return attacks
+
+def _line_reach(defn):
+    # attacker's direction of travel -> distances it strikes at along a blockable line
+    reach = {}
+    if not defn.can_capture:
+        return reach
+    for u in defn.rays:
+        reach.setdefault(u, set()).update(range(1, (defn.ray_range or max(ROWS, COLS)) + 1))
+    if not defn.jumps:
+        for dr, dc in defn.leaps:
+            if dr == 0 or dc == 0 or abs(dr) == abs(dc):
+                steps = max(abs(dr), abs(dc))
+                reach.setdefault((dr // steps, dc // steps), set()).add(steps)
+    return reach
+
+def _unblockable_offsets(defn):
+    # offsets struck without passing over any square (jumping or non-straight leaps)
+    if not defn.can_capture:
+        return set()
+    return {(dr, dc) for dr, dc in defn.leaps
+            if defn.jumps or not (dr == 0 or dc == 0 or abs(dr) == abs(dc))}
+
+ATTACK_GENERATORS = {kind: compile_attacks(defn) for kind, defn in PIECE_DEFS.items()}
+LINE_REACH = {kind: _line_reach(defn) for kind, defn in PIECE_DEFS.items()}
+UNBLOCKABLE = {kind: _unblockable_offsets(defn) for kind, defn in PIECE_DEFS.items()}
+
+def attack_kind(kind, last_moved_kind):
+    """Kind whose attack pattern a piece of this kind currently has (resolves mimics)."""
+    defn = PIECE_DEFS[kind]
+    if defn.mimic and last_moved_kind:
+        return defn.mimic_fallback if PIECE_DEFS[last_moved_kind].mimic else last_moved_kind
+    return kind
+
+def _blocking_squares(target, attacker, kind):
+    """Squares between attacker and target if its strike can be blocked, else None."""
+    dr, dc = target[0] - attacker[0], target[1] - attacker[1]
+    defn = PIECE_DEFS[kind]
+    if (dr, dc) in UNBLOCKABLE[kind] or (defn.teleport and defn.can_capture):
+        return None
+    if not (dr == 0 or dc == 0 or abs(dr) == abs(dc)):
+        return None
+    dist = max(abs(dr), abs(dc))
+    u = ((dr > 0) - (dr < 0), (dc > 0) - (dc < 0))
+    if dist not in LINE_REACH[kind].get(u, ()):
+        return None
+    return {(attacker[0] + u[0]*i, attacker[1] + u[1]*i) for i in range(1, dist)}
+
+# --- Check Info ---
+class CheckInfo:
+    """Checkers, pins and king danger squares for one side, computed once per position."""
+    def __init__(self, king=None, in_check=False, unrestricted=False):
+        self.king = king                  # king square, None if the side has no King
+        self.in_check = in_check
+        self.unrestricted = unrestricted  # King and Prince both alive: check never matters
+        self.checkers = []
+        self.line_checkers = set()        # checkers whose strike runs along a blockable line
+        self.evasions = None              # None when not in check, else squares that capture/block
+        self.pins = {}                    # pinned square -> squares it may still move to
+        self.king_danger = set()          # squares struck with the king lifted off the board
+
 # --- Board Class ---
 class Board:
     def __init__(self):
         self.pieces = {}
+        # occupancy indexes kept in step with self.pieces by place/remove/promote_piece_at
+        self.squares_by_kind = {'w': {}, 'b': {}}   # color -> kind -> set of squares
+        self.empty_by_parity = {0: set(), 1: set()}  # square colour (r+c)%2 -> empty squares
         # track moved for castling (original kings & rooks)
         self.has_moved = {'wK': False, 'bK': False,
                           'wR_left': False, 'wR_right': False,
@@ -54,10 +415,9 @@ class Board:
 
     def load_images(self):
         # expected filenames: assets/pieces/<color><kind>.png, e.g. wK.png, bJ.png
-        kinds = ['K','Q','R','B','N','P','C','J','S','L','V','W']
         colors = ['w','b']
         for color in colors:
-            for kind in kinds:
+            for kind in PIECE_DEFS:
                 key = color + kind
                 try:
                     img = pygame.image.load(f"assets/pieces/{key}.png").convert_alpha()
@@ -73,47 +433,63 @@ class Board:
         self.game_over = False
         self.winner = None
         self.last_moved_kind = None
-        # Final decided back-rank layout (left to right columns 0..9):
-        # R N B J K Q C B N R
-        def back_rank(color, row):
-            prefix = 'w' if color == 'white' else 'b'
-            layout = ['R','N','B','J','K','Q','C','B','N','R']  # Jester at col3, Bureaucrat at col6
-            for col, k in enumerate(layout):
-                self.pieces[(row, col)] = Piece(prefix, k)
-
-        back_rank('black', 0)
-        # row 1 black pawns -> replace specific pawn types as described
-        for col in range(COLS):
-            # front row mapping for black at row=1 (mirrors white)
-            # Squire in front of knights (cols 1 and 8)
-            # Paladin in front of bishops (cols 2 and 7? but bishop cols are 2 and 7 here)
-            # Prince in front of king (king at col4)
-            # Princess in front of queen (queen at col5)
-            # Squire -> 'S', Paladin -> 'L', Prince -> 'V', Princess -> 'W'
-            if col in (1, 8):
-                self.pieces[(1, col)] = Piece('b', 'S')  # Squire
-            elif col in (2, 7):
-                self.pieces[(1, col)] = Piece('b', 'L')  # Paladin
-            elif col == 4:
-                self.pieces[(1, col)] = Piece('b', 'V')  # Prince
-            elif col == 5:
-                self.pieces[(1, col)] = Piece('b', 'W')  # Princess
+        # black back rank on row 0 with its front row on row 1; white mirrored on rows 9 and 8
+        for color, back_row, front_row in (('b', 0, 1), ('w', ROWS - 1, ROWS - 2)):
+            for col, k in enumerate(BACK_RANK):
+                self.pieces[(back_row, col)] = Piece(color, k)
+            for col, k in enumerate(FRONT_RANK):
+                self.pieces[(front_row, col)] = Piece(color, k)
+        self.rebuild_indexes()
+
+    # --- Occupancy indexes ---
+    def _build_indexes(self):
+        squares_by_kind = {'w': {}, 'b': {}}
+        empty_by_parity = {0: set(), 1: set()}
+        for pos in ALL_SQUARES:
+            p = self.pieces.get(pos)
+            if p is None:
+                empty_by_parity[(pos[0] + pos[1]) % 2].add(pos)
             else:
-                self.pieces[(1, col)] = Piece('b', 'P')
-
-        back_rank('white', 9)
-        # row 8 white pawns: mirror (white pawns at row 8)
-        for col in range(COLS):
-            if col in (1, 8):
-                self.pieces[(8, col)] = Piece('w', 'S')  # Squire
-            elif col in (2, 7):
-                self.pieces[(8, col)] = Piece('w', 'L')  # Paladin
-            elif col == 4:
-                self.pieces[(8, col)] = Piece('w', 'V')  # Prince
-            elif col == 5:
-                self.pieces[(8, col)] = Piece('w', 'W')  # Princess
-            else:
-                self.pieces[(8, col)] = Piece('w', 'P')
+                squares_by_kind[p.color].setdefault(p.kind, set()).add(pos)
+        return squares_by_kind, empty_by_parity
+
+    def rebuild_indexes(self):
+        # needed after writing self.pieces directly instead of through place/remove
+        self.squares_by_kind, self.empty_by_parity = self._build_indexes()
+
+    def verify_indexes(self):
+        # debug check: every index must agree with a fresh scan of self.pieces
+        squares_by_kind, empty_by_parity = self._build_indexes()
+        for color in ('w', 'b'):
+            indexed = {k: sqs for k, sqs in self.squares_by_kind[color].items() if sqs}
+            assert indexed == squares_by_kind[color], f"{color} piece index out of sync: {indexed} != {squares_by_kind[color]}"
+        assert self.empty_by_parity == empty_by_parity, "empty square index out of sync"
+
+    def squares_of(self, color):
+        for squares in self.squares_by_kind[color].values():
+            yield from squares
+
+    def royal(self, color, kind):
+        # square of color's King/Prince/Princess (any one if promotion made several), or None
+        return next(iter(self.squares_by_kind[color].get(kind, ())), None)
+
+    def place(self, pos, piece):
+        # put piece on pos, replacing (capturing) anything already there
+        old = self.pieces.get(pos)
+        if old is not None:
+            self.squares_by_kind[old.color][old.kind].discard(pos)
+        else:
+            self.empty_by_parity[(pos[0] + pos[1]) % 2].discard(pos)
+        self.pieces[pos] = piece
+        self.squares_by_kind[piece.color].setdefault(piece.kind, set()).add(pos)
+
+    def remove(self, pos):
+        # take the piece off pos and return it (None if empty)
+        piece = self.pieces.pop(pos, None)
+        if piece is not None:
+            self.squares_by_kind[piece.color][piece.kind].discard(pos)
+            self.empty_by_parity[(pos[0] + pos[1]) % 2].add(pos)
+        return piece
 
     # --- Drawing ---
     def draw_board(self):
@@ -189,50 +565,123 @@ class Board:
 
     # --- Game Logic helpers ---
     def is_in_check(self, color):
+        return self.check_info(color).in_check
+
+    def has_legal_moves(self, color):
+        info = self.check_info(color)
+        for pos in self.squares_of(color):
+            p = self.pieces[pos]
+            if self.filter_legal(p, pos, MOVE_GENERATORS[p.kind](self, color, pos), info):
+                return True
+        return False
+
+    def check_info(self, color):
+        """
+        Collect checkers, pinned pieces and king danger squares for color in one pass over the enemy pieces.
+        """
         # find king position (king could be original K or if replaced, check piece with kind 'K' only)
-        king_pos = next((pos for pos, p in self.pieces.items() if p.color == color and p.kind == 'K'), None)
+        king_pos = self.royal(color, 'K')
         if not king_pos:
             # No king found - this means game should be over or prince hasn't transformed yet
-            return True
-        
-        # Check if BOTH King and Prince exist - only then can King be captured without check mattering
-        # If Prince was killed first, normal check rules apply
-        has_prince = any(p for p in self.pieces.values() if p.color == color and p.kind == 'V')
-        has_king = True  # We already found king above
-        
-        # Only ignore check if BOTH King and Prince are alive
-        if has_prince and has_king:
-            return False
-        
-        # Normal check detection - any enemy move that can reach king
-        for pos, p in list(self.pieces.items()):
-            if p.color != color:
-                enemy_moves = self.valid_moves(p, pos, ignore_check=True)
-                if king_pos in enemy_moves:
-                    return True
-        return False
+            return CheckInfo(in_check=True)
 
-    def has_legal_moves(self, color):
-        # iterate over a snapshot list to avoid dict mutation during simulation
-        for pos, p in list(self.pieces.items()):
-            if p.color != color:
+        # Only ignore check if BOTH King and Prince are alive
+        # If Prince was killed first, normal check rules apply
+        if self.royal(color, 'V'):
+            return CheckInfo(king_pos, unrestricted=True)
+
+        info = CheckInfo(king_pos)
+        # enemy attacks with our king lifted, so it can't hide behind its own square
+        lifted = self.pieces.copy()
+        del lifted[king_pos]
+        enemy = 'b' if color == 'w' else 'w'
+        for enemy_kind, squares in self.squares_by_kind[enemy].items():
+            if not squares:
                 continue
-            moves = self.valid_moves(p, pos)
-            for m in moves:
-                saved = self.pieces.get(m)
-                # simulate
-                self.pieces[m] = p
-                del self.pieces[pos]
-                in_check = self.is_in_check(color)
-                # undo
-                self.pieces[pos] = p
-                if saved:
-                    self.pieces[m] = saved
-                else:
-                    self.pieces.pop(m, None)
-                if not in_check:
-                    return True
-        return False
+            kind = attack_kind(enemy_kind, self.last_moved_kind)
+            for pos in squares:
+                hits = ATTACK_GENERATORS[kind](lifted, enemy, pos)
+                info.king_danger.update(hits)
+                if king_pos in hits:
+                    info.checkers.append(pos)
+                    between = _blocking_squares(king_pos, pos, kind)
+                    if between is not None:
+                        info.line_checkers.add(pos)
+                    if len(info.checkers) == 1:
+                        info.evasions = {pos} | (between or set())
+                    else:
+                        # double check: only the king (or en passant, checked separately) can answer it
+                        info.evasions = set()
+        info.in_check = bool(info.checkers)
+
+        # pins: our piece first on a line from the king with an enemy striking along it behind
+        for (ur, uc), ray in LINES[king_pos]:
+            own = None
+            for i, sq in enumerate(ray):
+                p = self.pieces.get(sq)
+                if p is None:
+                    continue
+                if own is None and p.color == color:
+                    own = sq
+                    continue
+                if own is not None and p.color != color:
+                    kind = attack_kind(p.kind, self.last_moved_kind)
+                    if i + 1 in LINE_REACH[kind].get((-ur, -uc), ()):
+                        info.pins[own] = set(ray[:i + 1])
+                break
+        return info
+
+    def filter_legal(self, piece, start, moves, info):
+        """
+        Keep only the moves that don't leave color's king in check, using check/pin masks from check_info.
+        """
+        if info.unrestricted:
+            return moves
+        if info.king is None:
+            return []
+        if start == info.king and piece.kind == 'K':
+            # castling only needs the landing square to be safe (the rook stays put for this test)
+            return [m for m in moves if m not in info.king_danger]
+
+        ep = None
+        if piece.kind == 'P' and self.last_pawn_double_move:
+            lr, lc = self.last_pawn_double_move
+            if start[0] == lr and (lr, lc) in self.pieces and self.pieces[(lr, lc)].color != piece.color:
+                ep = ((lr + (-1 if piece.color == 'w' else 1), lc), (lr, lc))
+
+        pin = info.pins.get(start)
+        legal = []
+        for m in moves:
+            if ep and m == ep[0]:
+                if self._en_passant_is_safe(info, piece.color, start, m, ep[1]):
+                    legal.append(m)
+                continue
+            if info.evasions is not None and m not in info.evasions:
+                continue
+            if pin is not None and m not in pin:
+                continue
+            legal.append(m)
+        return legal
+
+    def _en_passant_is_safe(self, info, color, start, dest, captured):
+        # en passant empties two squares at once, so rescan every line from the king
+        for pos in info.checkers:
+            if pos not in (dest, captured) and pos not in info.line_checkers:
+                return False
+        vacated = (start, captured)
+        for (ur, uc), ray in LINES[info.king]:
+            for i, sq in enumerate(ray):
+                if sq == dest:
+                    break
+                if sq in vacated:
+                    continue
+                p = self.pieces.get(sq)
+                if p is None:
+                    continue
+                if p.color != color and i + 1 in LINE_REACH[attack_kind(p.kind, self.last_moved_kind)].get((-ur, -uc), ()):
+                    return False
+                break
+        return True
 
     # Helper: generate moves for a given kind without recursion risk (used by Jester)
     def moves_for_kind(self, kind, color, start, ignore_check=True):
@@ -244,220 +693,12 @@ class Board:
         """
         Return list of destination tuples. If ignore_check==False, filter out moves that leave own king in check.
         """
-        r, c = start
         color, kind = piece.color, piece.kind
-        moves = []
-        inside = lambda x, y: 0 <= x < ROWS and 0 <= y < COLS
-
-        # Pawn (normal): forward 1 (or 2 from start), captures diag, en passant tracked via last_pawn_double_move
-        if kind == 'P':
-            direction = -1 if color == 'w' else 1
-            start_row = 8 if color == 'w' else 1
-            nr = r + direction
-            # forward 1
-            if inside(nr, c) and (nr, c) not in self.pieces:
-                moves.append((nr, c))
-                # forward 2 from start
-                two_r = r + 2*direction
-                if r == start_row and inside(two_r, c) and (two_r, c) not in self.pieces:
-                    moves.append((two_r, c))
-            # captures (and en passant)
-            for dc in (-1, 1):
-                nc = c + dc
-                if inside(nr, nc):
-                    if (nr, nc) in self.pieces and self.pieces[(nr, nc)].color != color:
-                        moves.append((nr, nc))
-                    # en passant: if pawn that moved two squares is adjacent on same row
-                    if self.last_pawn_double_move:
-                        lr, lc = self.last_pawn_double_move
-                        # last double move landed at lr,lc; en passant capture landing square is (nr,nc)
-                        # condition: lr == r and lc == nc (opponent pawn moved to adjacent column)
-                        if lr == r and lc == nc:
-                            # landing square is nr,nc
-                            moves.append((nr, nc))
-
-        # Rook
-        elif kind == 'R':
-            for dr, dc in [(-1,0),(1,0),(0,-1),(0,1)]:
-                nr, nc = r + dr, c + dc
-                while inside(nr, nc):
-                    if (nr, nc) in self.pieces:
-                        if self.pieces[(nr, nc)].color != color:
-                            moves.append((nr, nc))
-                        break
-                    moves.append((nr, nc))
-                    nr += dr; nc += dc
-
-        # Bishop
-        elif kind == 'B':
-            for dr, dc in [(-1,-1),(-1,1),(1,-1),(1,1)]:
-                nr, nc = r + dr, c + dc
-                while inside(nr, nc):
-                    if (nr, nc) in self.pieces:
-                        if self.pieces[(nr, nc)].color != color:
-                            moves.append((nr, nc))
-                        break
-                    moves.append((nr, nc))
-                    nr += dr; nc += dc
-
-        # Knight
-        elif kind == 'N':
-            for dr, dc in [(-2,-1),(-2,1),(2,-1),(2,1),(-1,-2),(-1,2),(1,-2),(1,2)]:
-                nr, nc = r + dr, c + dc
-                if inside(nr, nc) and ((nr, nc) not in self.pieces or self.pieces[(nr, nc)].color != color):
-                    moves.append((nr, nc))
-
-        # Queen
-        elif kind == 'Q':
-            for dr, dc in [(-1,0),(1,0),(0,-1),(0,1),(-1,-1),(-1,1),(1,-1),(1,1)]:
-                nr, nc = r + dr, c + dc
-                while inside(nr, nc):
-                    if (nr, nc) in self.pieces:
-                        if self.pieces[(nr, nc)].color != color:
-                            moves.append((nr, nc))
-                        break
-                    moves.append((nr, nc))
-                    nr += dr; nc += dc
-
-        # Bureaucrat (C): can move to ANY empty square of same color parity; cannot capture
-        elif kind == 'C':
-            start_color = (r + c) % 2
-            for row in range(ROWS):
-                for col in range(COLS):
-                    if (row + col) % 2 == start_color and (row, col) not in self.pieces:
-                        moves.append((row, col))
-
-        # Jester (J): moves like the opponent's last moved piece kind (if available).
-        # It can capture normally. If there's no last kind, it moves like a king as fallback.
-        elif kind == 'J':
-            last_kind = self.last_moved_kind
-            if last_kind:
-                # Use moves_for_kind but avoid infinite recursion: pass ignore_check=True to not re-filter
-                # Create a fake piece of that kind with jester's color, but call a helper that won't call J->J recursively:
-                # We call moves_for_kind which internally calls valid_moves(fake,...) - could loop if last_kind == 'J'
-                # To avoid cycles: if last_kind == 'J', fallback to King moves
-                if last_kind == 'J':
-                    last_kind = 'K'
-                # generate moves as if a piece of kind last_kind were at Jester's position
-                temp_moves = []
-                # implement movement for last_kind without invoking J again by calling valid_moves with ignore_check=True
-                temp_piece = Piece(piece.color, last_kind)
-                temp_moves = self.valid_moves(temp_piece, start, ignore_check=True)
-                # only include moves that either capture enemy or land on empty
-                for mv in temp_moves:
-                    if mv not in self.pieces or self.pieces[mv].color != piece.color:
-                        moves.append(mv)
-            else:
-                # fallback: king-like moves
-                for dr in (-1,0,1):
-                    for dc in (-1,0,1):
-                        if dr==0 and dc==0: continue
-                        nr,nc = r+dr, c+dc
-                        if 0<=nr<ROWS and 0<=nc<COLS and ((nr,nc) not in self.pieces or self.pieces[(nr,nc)].color!=piece.color):
-                            moves.append((nr,nc))
-
-        # Squire (S): moves 2 squares orthogonally (up/down/left/right), *jumps* over the intermediate square (like a knight)
-        elif kind == 'S':
-            for dr, dc in [(-2,0),(2,0),(0,-2),(0,2)]:
-                nr, nc = r+dr, c+dc
-                if inside(nr,nc) and ((nr,nc) not in self.pieces or self.pieces[(nr,nc)].color != color):
-                    moves.append((nr,nc))
-
-        # Paladin (L): moves 2 squares diagonally, jumps over the intermediate square
-        elif kind == 'L':
-            for dr,dc in [(-2,-2),(-2,2),(2,-2),(2,2)]:
-                nr,nc = r+dr, c+dc
-                if inside(nr,nc) and ((nr,nc) not in self.pieces or self.pieces[(nr,nc)].color != color):
-                    moves.append((nr,nc))
-
-        # Prince (V): can move up to 2 squares in any direction (no jumping) and capture
-        # Moves like a king but with range 2 - only orthogonal and diagonal directions
-        elif kind == 'V':
-            # Eight directions: orthogonal and diagonal
-            for dr, dc in [(-1,0),(1,0),(0,-1),(0,1),(-1,-1),(-1,1),(1,-1),(1,1)]:
-                # Try 1 square and 2 squares in each direction
-                for distance in (1, 2):
-                    nr, nc = r + dr*distance, c + dc*distance
-                    if not inside(nr, nc):
-                        break  # Can't go further in this direction
-                    # Check if path is blocked (for distance 2, check intermediate square)
-                    if distance == 2:
-                        mid_r, mid_c = r + dr, c + dc
-                        if (mid_r, mid_c) in self.pieces:
-                            break  # Path blocked, can't move 2 squares
-                    # Check destination
-                    if (nr, nc) in self.pieces:
-                        if self.pieces[(nr, nc)].color != color:
-                            moves.append((nr, nc))  # Can capture
-                        break  # Can't go further
-                    else:
-                        moves.append((nr, nc))  # Empty square
-
-        # Princess (W): can move up to 3 squares in any direction (queen-like but capped to 3), path must be clear
-        elif kind == 'W':
-            for dr,dc in [(-1,0),(1,0),(0,-1),(0,1),(-1,-1),(-1,1),(1,-1),(1,1)]:
-                for step in (1,2,3):
-                    nr, nc = r + dr*step, c + dc*step
-                    if not inside(nr,nc): break
-                    if (nr,nc) in self.pieces:
-                        if self.pieces[(nr,nc)].color != color:
-                            moves.append((nr,nc))
-                        break
-                    moves.append((nr,nc))
-
-        # King (K)
-        elif kind == 'K':
-            for dr in (-1,0,1):
-                for dc in (-1,0,1):
-                    if dr==0 and dc==0: continue
-                    nr, nc = r+dr, c+dc
-                    if inside(nr,nc) and ((nr,nc) not in self.pieces or self.pieces[(nr,nc)].color != color):
-                        moves.append((nr,nc))
-            # castling (special 10x10 positions); only if original king still exists and hasn't moved
-            row = 9 if color == 'w' else 0
-            left_between = [(row,i) for i in range(1,4)]
-            right_between = [(row,i) for i in range(5,9)]
-            if color == 'w':
-                if not self.has_moved['wK'] and not self.has_moved['wR_left'] and all(pos not in self.pieces for pos in left_between):
-                    moves.append((row,1))
-                if not self.has_moved['wK'] and not self.has_moved['wR_right'] and all(pos not in self.pieces for pos in right_between):
-                    moves.append((row,7))
-            else:
-                if not self.has_moved['bK'] and not self.has_moved['bR_left'] and all(pos not in self.pieces for pos in left_between):
-                    moves.append((row,1))
-                if not self.has_moved['bK'] and not self.has_moved['bR_right'] and all(pos not in self.pieces for pos in right_between):
-                    moves.append((row,7))
+        moves = MOVE_GENERATORS[kind](self, color, start)
 
         # --- Filter moves that would leave king in check (unless ignore_check True) ---
         if not ignore_check:
-            safe_moves = []
-            # take snapshot to restore after simulating each move
-            pieces_snapshot = self.pieces.copy()
-            for m in moves:
-                # simulate move
-                taken = self.pieces.get(m)
-                self.pieces[m] = piece
-                # special case: if capturing en passant, remove the captured pawn behind the landing square
-                removed_en_passant = None
-                if piece.kind == 'P' and self.last_pawn_double_move:
-                    lr, lc = self.last_pawn_double_move
-                    # an en passant capture lands on nr,nc == m and removes pawn at (r, nc)
-                    # detect and remove if appropriate
-                    if (m[0] == lr + (-1 if piece.color == 'w' else 1)) and (m[1] == lc) and (r == lr):
-                        # the captured pawn sits at lr,lc; ensure we only remove opponent pawn at that square
-                        if (lr, lc) in self.pieces and self.pieces[(lr, lc)].color != piece.color:
-                            removed_en_passant = (lr, lc)
-                            del self.pieces[(lr, lc)]
-                # remove source
-                if start in self.pieces:
-                    del self.pieces[start]
-                # check
-                in_check = self.is_in_check(color)
-                # restore from snapshot
-                self.pieces = pieces_snapshot.copy()
-                if not in_check:
-                    safe_moves.append(m)
-            return safe_moves
+            return self.filter_legal(piece, start, moves, self.check_info(color))
 
         return moves
 
@@ -465,7 +706,9 @@ class Board:
     def promote_piece_at(self, pos, new_kind):
         if pos in self.pieces:
             p = self.pieces[pos]
+            self.squares_by_kind[p.color][p.kind].discard(pos)
             p.kind = new_kind
+            self.squares_by_kind[p.color].setdefault(new_kind, set()).add(pos)
 
 # --- Game Class ---
 class Game:
@@ -525,18 +768,18 @@ class Game:
         row = 9 if piece.color == 'w' else 0
         if end == (row,1):
             # queenside castling: king -> col=1, rook from col=0 -> col=2
-            rook = self.board.pieces.pop((row,0), None)
+            rook = self.board.remove((row,0))
             if rook:
-                self.board.pieces[(row,2)] = rook
+                self.board.place((row,2), rook)
             if piece.color == 'w':
                 self.board.has_moved['wR_left'] = True
             else:
                 self.board.has_moved['bR_left'] = True
         elif end == (row,7):
             # kingside castling: king -> col=7, rook from col=9 -> col=6
-            rook = self.board.pieces.pop((row,9), None)
+            rook = self.board.remove((row,9))
             if rook:
-                self.board.pieces[(row,6)] = rook
+                self.board.place((row,6), rook)
             if piece.color == 'w':
                 self.board.has_moved['wR_right'] = True
             else:
@@ -555,7 +798,7 @@ class Game:
         Perform move; assumes dest is valid among valid_moves.
         Handles castling, en passant, promotions, prince->king substitution after king capture.
         """
-        piece = self.board.pieces.pop(start)
+        piece = self.board.remove(start)
         color = piece.color
         captured = None
 
@@ -585,7 +828,7 @@ class Game:
                 if dest[1] == lc and dest[0] == lr + dir_move and start[0] == lr:
                     # remove the captured pawn at lr,lc
                     if (lr, lc) in self.board.pieces and self.board.pieces[(lr,lc)].color != piece.color:
-                        del self.board.pieces[(lr,lc)]
+                        self.board.remove((lr,lc))
                         captured = (lr,lc)
 
         # Normal capture
@@ -597,10 +840,10 @@ class Game:
                 # remove captured king by assigning captured variable; replacement will be handled after placing our piece
                 pass
             # remove captured piece (we'll overwrite below)
-            del self.board.pieces[dest]
+            self.board.remove(dest)
 
         # Place moving piece
-        self.board.pieces[dest] = piece
+        self.board.place(dest, piece)
 
         # Pawn double-move tracking for en passant
         if piece.kind == 'P' and abs(dest[0] - start[0]) == 2:
@@ -608,36 +851,30 @@ class Game:
         else:
             self.board.last_pawn_double_move = None
 
-        # Pawn promotion
-        if piece.kind == 'P' and (dest[0] == 0 or dest[0] == 9):
-            # ask player to choose
-            new_kind = self.choose_promotion(piece.color)
-            if new_kind:
-                piece.kind = new_kind
-
-        # Squire promotion: if reaches back row, becomes Knight
-        if piece.kind == 'S' and (dest[0] == 0 or dest[0] == 9):
-            piece.kind = 'N'
-
-        # Paladin promotion: if reaches back row, becomes Bishop
-        if piece.kind == 'L' and (dest[0] == 0 or dest[0] == 9):
-            piece.kind = 'B'
+        # Promotion: Pawn -> player's choice, Squire -> Knight, Paladin -> Bishop.
+        # Keep promoting while the new kind also promotes on this row (e.g. Pawn -> Squire -> Knight).
+        while dest[0] in PIECE_DEFS[piece.kind].promotion_rows:
+            # no fixed target means ask player to choose
+            new_kind = PIECE_DEFS[piece.kind].promotes_to or self.choose_promotion(piece.color)
+            if not new_kind:
+                break
+            self.board.promote_piece_at(dest, new_kind)
 
         # If we captured opponent's King: check for Prince -> King substitution
         # Captured info might be the dest square earlier or removed by en passant logic; check if a King of opposite color exists still.
         # Actually we removed captured king above (if dest had king, it was deleted). Now see if the owner (opponent) has a Prince.
         opponent = 'b' if color == 'w' else 'w'
         # if opponent has no King but has a Prince -> transform Prince->King and Princess->Queen
-        opp_has_king = any(p for p in self.board.pieces.values() if p.color == opponent and p.kind == 'K')
-        opp_has_prince_pos = next((pos for pos,p in self.board.pieces.items() if p.color == opponent and p.kind == 'V'), None)
-        opp_has_princess_pos = next((pos for pos,p in self.board.pieces.items() if p.color == opponent and p.kind == 'W'), None)
+        opp_has_king = self.board.royal(opponent, 'K')
+        opp_has_prince_pos = self.board.royal(opponent, 'V')
+        opp_has_princess_pos = self.board.royal(opponent, 'W')
         if not opp_has_king and opp_has_prince_pos:
             # Prince becomes King (no castling allowed)
             prince_pos = opp_has_prince_pos
-            self.board.pieces[prince_pos].kind = 'K'
+            self.board.promote_piece_at(prince_pos, 'K')
             # Princess becomes Queen (if present)
             if opp_has_princess_pos:
-                self.board.pieces[opp_has_princess_pos].kind = 'Q'
+                self.board.promote_piece_at(opp_has_princess_pos, 'Q')
             # disable castling for that side
             if opponent == 'w':
                 self.board.has_moved['wK'] = True
@@ -651,6 +888,9 @@ class Game:
         # Update board.last_moved_kind for Jester
         self.board.last_moved_kind = piece.kind
 
+        if DEBUG:
+            self.board.verify_indexes()
+
     def handle_click(self):
         pos = self.board.get_square_under_mouse()
         # if a piece currently selected